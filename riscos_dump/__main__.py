@@ -5,11 +5,16 @@ Command line tool for dumping files.
 
 import argparse
 import errno
+import io
 import sys
 
 import riscos_dump.dump as dump
 
 
+# Files smaller than this will be read into memory, rather than accessed through a FileDataSource
+read_whole_file_limit = 64 * 1024 * 1024
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('filename',
@@ -31,7 +36,7 @@ def main():
     dumper = dump.Dump()
     if options.words:
         dumper.width = 4
-        dumper.columns = int(row_size / dumper.width)
+        dumper.columns = row_size // dumper.width
 
     # Work out the address that the file starts at
     baseaddr = options.baseaddr
@@ -46,8 +51,14 @@ def main():
     try:
         with open(filename, 'rb') as fh:
 
-            filedata = dump.FileDataSource(fh)
-            filedata.base_offset = options.fileoffset
+            fh.seek(0, io.SEEK_END)
+            size = fh.tell()
+            if size - options.fileoffset < read_whole_file_limit:
+                fh.seek(options.fileoffset)
+                filedata = fh.read()
+            else:
+                filedata = dump.FileDataSource(fh)
+                filedata.base_offset = options.fileoffset
 
             dumper.show(filedata)
 
@@ -14,11 +14,33 @@ It can be displayed in widths of 1, 2, 4, and 8 bytes, in little or big endian,
 without the text area. Offsets are configurable, and the number of columns are changeable.
 """
 
+import collections
 import io
+import mmap
+import os
 import struct
 import sys
 
 
+# Translation tables for the text column; non-printable characters are shown as '.'
+chars_table_low = bytes(bytearray(c if (c >= 32 and c < 0x7f) else 0x2e
+                                  for c in range(256)))
+chars_table_high = bytes(bytearray(c if (c >= 32 and c < 0x7f) or (c >= 0xa0) else 0x2e
+                                   for c in range(256)))
+
+# Struct format characters for each of the value widths
+struct_codes = {2: 'H', 4: 'L', 8: 'Q'}
+
+# Hexadecimal representation of each byte, with its leading separator
+hex_bytes = tuple(' {:02X}'.format(b) for b in range(256))
+
+# Whether the byte types can produce hex with a separator themselves (Python 3.8 onwards)
+try:
+    hex_separator = (b'\x01\x02'.hex(' ') == '01 02')
+except (AttributeError, TypeError):
+    hex_separator = False
+
+
 class DumpBase(object):
     """
     Base class which works out all the parameters for the memory dump.
@@ -27,8 +49,10 @@ class DumpBase(object):
     processes the data so that the rows and columns will be presentable.
     """
 
-    # Class variable which caches format strings for all objects
-    format_strings = {}
+    # Class variable which caches compiled Struct objects for all objects
+    struct_cache = {}
+    # Previous name for the cache
+    format_strings = struct_cache
 
     def __init__(self):
         self.address_base = 0
@@ -81,7 +105,7 @@ class DumpBase(object):
         """
         Convert from a data offset to a row number.
         """
-        return int(offset / (self.columns * self.width))
+        return offset // (self.columns * self.width)
 
     def address_to_coords(self, address):
         """
@@ -95,7 +119,7 @@ class DumpBase(object):
         rowsize = self.columns * self.width
         if offset < 0 or offset > len(self.data):
             return (None, None)
-        return (int(offset / rowsize), offset % rowsize)
+        return divmod(offset, rowsize)
 
     def coords_to_address(self, row, col, bound=False):
         """
@@ -137,17 +161,24 @@ class DumpBase(object):
         Return the number of rows present.
         """
         rowsize = self.columns * self.width
-        return int((len(self.data) + rowsize - 1) / rowsize)
+        return (len(self.data) + rowsize - 1) // rowsize
 
     def format_address(self, offset):
-        return '{:x}'.format(offset + self.address_base)
+        return '%x' % (offset + self.address_base,)
 
     def format_chars(self, data):
-        if self.text_high:
-            valid = lambda c: (c >= 32 and c < 0x7f) or (c >= 0xa0)
-        else:
-            valid = lambda c: c >= 32 and c < 0x7f
-        return ''.join(chr(c) if valid(c) else '.' for c in data)
+        """
+        Convert a sequence of byte values into the text column representation.
+        """
+        table = chars_table_high if self.text_high else chars_table_low
+        if not isinstance(data, (bytes, bytearray)):
+            # Sequences of values, and memoryviews, must be converted before translation
+            data = bytearray(data)
+        chars = data.translate(table)
+        if str is bytes:
+            # Python 2 strings are bytes, so the text stays in the native type
+            return bytes(chars)
+        return chars.decode('latin-1')
 
     def format_annotation(self, row):
         if self.annotations:
@@ -164,39 +195,39 @@ class DumpBase(object):
         """
         Return the data for a given row.
         """
-        start = self.row_to_offset(row)
-        end = self.row_to_offset(row + 1)
-        return bytearray(self.data[start:end])
+        rowsize = self.columns * self.width
+        start = rowsize * row
+        return self.data[start:start + rowsize]
 
     def row_values(self, row):
         """
         Return the data for a given row.
         """
-        rowdata = self.row_data(row)
+        return self.data_values(self.row_data(row))
 
+    def data_values(self, rowdata):
+        """
+        Return the values within the data for a row.
+        """
         if self.width == 1:
-            return [b for b in rowdata]
+            return list(bytearray(rowdata))
 
         if len(rowdata) % self.width != 0:
-            rowdata += '\x00' * (self.width - (len(rowdata) % self.width))
+            rowdata = bytearray(rowdata) + b'\x00' * (self.width - (len(rowdata) % self.width))
 
+        _struct = self.struct_cache
         key = (self.width, len(rowdata), self.little_endian)
-        format_string = self.format_strings.get(key, None)
-        if format_string is None:
-            if self.width == 2:
-                format_string = 'H'
-            elif self.width == 4:
-                format_string = 'L'
-            elif self.width == 8:
-                format_string = 'Q'
-            format_string = format_string * int(len(rowdata) / self.width)
+        rowstruct = _struct.get(key, None)
+        if rowstruct is None:
+            format_string = struct_codes[self.width] * (len(rowdata) // self.width)
             if self.little_endian:
                 format_string = '<' + format_string
             else:
                 format_string = '>' + format_string
-            self.format_strings[key] = format_string
+            rowstruct = struct.Struct(format_string)
+            _struct[key] = rowstruct
 
-        rowvalues = struct.unpack(format_string, rowdata)
+        rowvalues = rowstruct.unpack_from(rowdata, 0)
         return rowvalues
 
 
@@ -217,35 +248,103 @@ class Dump(DumpBase):
         self.pad_data = True
         self.prefix_chars = {}
 
+        # Size of a row in bytes, and the padding for short rows (indexed by the
+        # number of missing values); recalculated when the data is shown
+        self._rowsize = self.columns * self.width
+        self._padding = self.padding_strings()
+
+        # Number of lines to accumulate before they are written to the file handle;
+        # lines are only accumulated whilst the data is being shown.
+        self.flush_lines = 1024
+        self._buf = []
+        self._buffering = False
+
+        # Number of rows to read at a time from data sources which aren't held in memory
+        self.block_rows = 256
+
     def writeln(self, msg):
-        self.fh.write(msg + '\n')
+        """
+        Add a line to the output.
+
+        Whilst the data is being shown, the line is kept until flush() is called;
+        otherwise it is written immediately.
+        """
+        if self._buffering:
+            self._buf.append(msg)
+        else:
+            self.flush()
+            self.fh.write(msg + '\n')
+
+    def flush(self):
+        """
+        Write any buffered lines to the file handle.
+        """
+        if self._buf:
+            self._buf.append('')
+            output = '\n'.join(self._buf)
+            del self._buf[:]
+
+            # When writing to stdout, we can skip the text layer and write to the
+            # binary buffer beneath, provided that no newline translation is needed.
+            raw = None
+            if self.fh is sys.stdout and os.linesep == '\n':
+                raw = getattr(self.fh, 'buffer', None)
+
+            if raw is not None:
+                # Anything already written to the text layer must be output first
+                self.fh.flush()
+                raw.write(output.encode(self.fh.encoding or 'ascii', self.fh.errors or 'strict'))
+            else:
+                self.fh.write(output)
 
     def format_address(self, offset):
         if self.zero_pad_offset:
-            return '{:08X}'.format(offset + self.address_base)
+            return '%08X' % (offset + self.address_base,)
         else:
-            return '{:8X}'.format(offset + self.address_base)
+            return '%8X' % (offset + self.address_base,)
+
+    def padding_strings(self):
+        """
+        Return the padding strings for rows which are missing values.
+
+        @return:    list of padding strings, indexed by the number of missing values
+        """
+        chunk = ' ' * (self.width * 2 + 1)
+        return [chunk * missing for missing in range(self.columns + 1)]
 
     def format_row(self, row_count):
+        rowsize = self._rowsize
+        offset = rowsize * row_count
         rowdata = self.row_data(row_count)
         if not rowdata:
             return None
 
-        offset = self.row_to_offset(row_count)
-
         rowbytevalues = rowdata
-        rowvalues = self.row_values(row_count)
-
-        rowdesc = ''.join('{}{:0{}X}'.format(self.prefix_chars.get(offset + i * self.width, ' '),
-                                             v, self.width * 2) for i, v in enumerate(rowvalues))
-        if self.prefix_chars.get(offset + (len(rowvalues) - 1) * self.width, None) == '>':
-            rowdesc += '<'
+        if type(self).row_values == DumpBase.row_values:
+            # The values can come from the data we already have
+            rowvalues = self.data_values(rowdata)
         else:
-            rowdesc += ' '
-        if rowdesc[0] == '<':
-            rowdesc = ' ' + rowdesc[1:]
+            rowvalues = self.row_values(row_count)
+
+        prefix_chars = self.prefix_chars
+        rowend = offset + rowsize
+        if prefix_chars and any(offset <= prefix_offset < rowend for prefix_offset in prefix_chars):
+            # The highlight markers fall in this row, so each value must be checked
+            rowdesc = ''.join('{}{:0{}X}'.format(prefix_chars.get(offset + i * self.width, ' '),
+                                                 v, self.width * 2) for i, v in enumerate(rowvalues))
+            if prefix_chars.get(offset + (len(rowvalues) - 1) * self.width, None) == '>':
+                rowdesc += '<'
+            else:
+                rowdesc += ' '
+            if rowdesc[0] == '<':
+                rowdesc = ' ' + rowdesc[1:]
+        elif self.width == 1:
+            rowdesc = ''.join([hex_bytes[b] for b in rowvalues]) + ' '
+        else:
+            value_format = ' {:0%dX}' % (self.width * 2,)
+            rowdesc = (value_format * len(rowvalues)).format(*rowvalues) + ' '
         if len(rowvalues) < self.columns:
-            padding = ((' ' * (self.width * 2)) + ' ') * (self.columns - len(rowvalues))
+            padding = self._padding[self.columns - len(rowvalues)]
             if rowdesc[-1] == '<':
                 rowdesc += padding[1:]
             else:
@@ -269,6 +368,123 @@ class Dump(DumpBase):
                                          rowtext,
                                          rownote)
 
+    def row_renderer(self):
+        """
+        Create a function to format rows which contain no highlights.
+
+        The function is specialised for the current configuration, so that the
+        data is sliced, decoded, and converted to hex and text in a single pass.
+        It is only valid for the duration of a `show` call.
+
+        @return:    function taking a row number, returning the formatted line
+                    or None if there is no data for the row
+        """
+        data = self.data
+        rowsize = self._rowsize
+        columns = self.columns
+        width = self.width
+        format_address = self.format_address
+        format_chars = self.format_chars
+        format_annotation = self.format_annotation
+        data_values = self.data_values
+        text = self.text
+        annotations = self.annotations
+        pad = ' ' if self.pad_data else ''
+        # The indent is used within format templates, so must have any braces escaped
+        indent = self.indent.replace('{', '{{').replace('}', '}}')
+        line_format = indent + '{a} :' + pad + '{v}' + pad + '{t}{n}'
+        padding = self._padding
+
+        if width == 1:
+            full_format = None
+
+            if hex_separator:
+                def format_values(rowdata):
+                    if not isinstance(rowdata, (bytes, memoryview)):
+                        rowdata = bytearray(rowdata)
+                    return ' ' + rowdata.hex(' ').upper()
+            else:
+                def format_values(rowdata):
+                    return ''.join([hex_bytes[b] for b in bytearray(rowdata)])
+        else:
+            value_format = ' {:0%dX}' % (width * 2,)
+            endian = '<' if self.little_endian else '>'
+            # Full rows are formatted by a single template holding every value in the line
+            full_format = indent + '{a} :' + pad + value_format * columns + ' ' + pad + '{t}{n}'
+            full_unpack = struct.Struct(endian + struct_codes[width] * columns).unpack_from
+
+            # Only the final row can be short, so we can prepare for its size in advance
+            tail_size = len(data) % rowsize
+            tail_count = (tail_size + width - 1) // width
+            tail_padding = b'\x00' * (tail_count * width - tail_size)
+            tail_format = value_format * tail_count
+            tail_unpack = struct.Struct(endian + struct_codes[width] * tail_count).unpack_from
+
+            def format_values(rowdata):
+                if len(rowdata) == tail_size:
+                    return tail_format.format(*tail_unpack(bytearray(rowdata) + tail_padding, 0))
+                rowvalues = data_values(rowdata)
+                return (value_format * len(rowvalues)).format(*rowvalues)
+
+        if isinstance(data, memoryview):
+            def row_data(offset):
+                return data[offset:offset + rowsize]
+        else:
+            # Other data sources (such as files) are read a block of rows at a time,
+            # rather than making an access for every row.
+            blocksize = rowsize * self.block_rows
+            block = [0, b'']
+
+            def row_data(offset):
+                blockoffset = offset - block[0]
+                if blockoffset < 0 or blockoffset >= len(block[1]):
+                    blockdata = data[offset:offset + blocksize]
+                    try:
+                        blockdata = memoryview(blockdata)
+                    except TypeError:
+                        # A sequence of values rather than a buffer
+                        blockdata = memoryview(bytearray(blockdata))
+                    block[0] = offset
+                    block[1] = blockdata
+                    blockoffset = 0
+                return block[1][blockoffset:blockoffset + rowsize]
+
+        def render_row(row):
+            offset = rowsize * row
+            rowdata = row_data(offset)
+            if not rowdata:
+                return None
+
+            rowtext = (': ' + format_chars(rowdata)) if text else ''
+            rownote = ' : {}'.format(format_annotation(row)) if annotations else ''
+
+            if full_format and len(rowdata) == rowsize:
+                return full_format.format(*full_unpack(rowdata, 0),
+                                          a=format_address(offset), t=rowtext, n=rownote)
+
+            rowdesc = format_values(rowdata) + ' '
+            if len(rowdata) < rowsize:
+                rowdesc += padding[columns - (len(rowdata) + width - 1) // width]
+
+            return line_format.format(a=format_address(offset), v=rowdesc, t=rowtext, n=rownote)
+
+        return render_row
+
+    def format_heading(self):
+        rowtitle = '{:<8}'.format(self.address_label)
+        rowcolumns = ''.join('{:>{}}'.format(heading, self.width * 2 + 1) for heading in self.data_headings())
+
+        if self.text:
+            rowtext = ' : {}'.format(self.text_label)
+        else:
+            rowtext = ''
+        return "{}{} :{}{}{}{}".format(self.indent,
+                                       rowtitle,
+                                       ' ' if self.pad_data else '',
+                                       rowcolumns,
+                                       ' ' if self.pad_data else '',
+                                       rowtext)
+
     def update_prefix_chars(self):
         self.prefix_chars = {}
         if self.offset_highlight is not None:
@@ -276,50 +492,94 @@ class Dump(DumpBase):
             self.prefix_chars[self.offset_highlight + self.width] = '<'
 
     def show(self, data):
-        self.data = data
+        if isinstance(data, (bytes, bytearray)):
+            # Slices of a memoryview share the underlying data, rather than copying it
+            self.data = memoryview(data)
+        else:
+            self.data = data
 
+        self._rowsize = self.columns * self.width
+        self._padding = self.padding_strings()
         self.update_prefix_chars()
 
+        # The heading doesn't change during the dump, so we only need to build it once
+        if self.heading:
+            heading_line = self.format_heading()
+
+        # Rows without highlights can use a renderer specialised for this configuration,
+        # unless a subclass has changed how rows are read or formatted.
+        cls = type(self)
+        if cls.format_row == Dump.format_row and \
+           cls.row_data == DumpBase.row_data and \
+           cls.row_values == DumpBase.row_values:
+            render_row = self.row_renderer()
+        else:
+            render_row = self.format_row
+        rowsize = self._rowsize
+        highlight_rows = set(prefix_offset // rowsize for prefix_offset in self.prefix_chars)
+
         self.row_count = 0
-        while True:
-            line = self.format_row(self.row_count)
-            if not line:
-                break
+        self._buffering = True
+        try:
+            while True:
+                if self.row_count in highlight_rows:
+                    line = self.format_row(self.row_count)
+                else:
+                    line = render_row(self.row_count)
+                if not line:
+                    break
+
+                if self.heading:
+                    if (self.row_count % self.heading_every) == 0:
+                        if self.row_count != 0 and self.heading_breaks:
+                            self.writeln('')
+
+                        self.writeln(heading_line)
 
-            if self.heading:
-                if (self.row_count % self.heading_every) == 0:
-                    if self.row_count != 0 and self.heading_breaks:
-                        self.writeln('')
+                        if self.heading_breaks == 2:
+                            self.writeln('')
 
-                    rowtitle = '{:<8}'.format(self.address_label)
-                    rowcolumns = ''.join('{:>{}}'.format(heading, self.width * 2 + 1) for heading in self.data_headings())
+                self.writeln(line)
+                self.row_count += 1
 
-                    if self.text:
-                        rowtext = ' : {}'.format(self.text_label)
-                    self.writeln("{}{} :{}{}{}{}".format(self.indent,
-                                                         rowtitle,
-                                                         ' ' if self.pad_data else '',
-                                                         rowcolumns,
-                                                         ' ' if self.pad_data else '',
-                                                         rowtext))
+                if len(self._buf) >= self.flush_lines:
+                    self.flush()
 
-                    if self.heading_breaks == 2:
-                        self.writeln('')
+        finally:
+            # Anything produced before a failure is still written out
+            self._buffering = False
+            self.flush()
 
-            self.writeln(line)
-            self.row_count += 1
+            # Release the view, so that the caller is able to resize their data
+            self.data = data
 
 
 class FileDataSource(object):
     search_chunk_size = 1024
 
+    # Files which can't be mapped are read in chunks of this size, keeping the most
+    # recently used chunks so that nearby accesses don't need to read the file again.
+    read_chunk_size = 64 * 1024
+    read_chunk_limit = 64
+
     def __init__(self, fh):
         self.fh = fh
         self.offset = -1
         self.base_offset = 0
         self._len = None
+        self._chunks = collections.OrderedDict()
+
+        # Map the file into memory if we can, so that accesses don't need to seek and read
+        try:
+            self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, ValueError, EnvironmentError, mmap.error):
+            # Not a regular file (or an empty one), so we must use the file handle
+            self._mm = None
 
     def __len__(self):
+        if self._mm is not None:
+            return max(len(self._mm) - self.base_offset, 0)
+
         if self._len is None:
             self.fh.seek(0, io.SEEK_END)
             self.offset = -1
@@ -340,45 +600,113 @@ class FileDataSource(object):
         else:
             raise IndexError("Cannot use items of type %s with FileDataSource" % (index.__class__.__name__,))
 
-        if self.offset != start:
-            self.fh.seek(start + self.base_offset)
-            self.offset = start
-        data = self.fh.read(size)
-        self.offset += len(data)
+        if self._mm is not None:
+            start += self.base_offset
+            return self._mm[start:start + size]
+
+        if size > self.read_chunk_size * 4:
+            # Large reads go straight to the file, rather than through the chunks
+            if self.offset != start:
+                self.fh.seek(start + self.base_offset)
+                self.offset = start
+            data = self.fh.read(size)
+            self.offset += len(data)
+            return data
+
+        start += self.base_offset
+        first = start // self.read_chunk_size
+        last = (start + size - 1) // self.read_chunk_size
+        parts = []
+        for chunk in range(first, last + 1):
+            data = self._read_chunk(chunk)
+            parts.append(data)
+            if len(data) < self.read_chunk_size:
+                # Reached the end of the file
+                break
+        data = parts[0] if len(parts) == 1 else b''.join(parts)
+        start -= first * self.read_chunk_size
+        return data[start:start + size]
+
+    def _read_chunk(self, chunk):
+        """
+        Read a chunk of the file, using the cached copy if we have one.
+
+        @param chunk:   Chunk number in the file
+
+        @return:    bytes for the chunk (which will be short at the end of the file)
+        """
+        data = self._chunks.pop(chunk, None)
+        if data is None:
+            self.fh.seek(chunk * self.read_chunk_size)
+            self.offset = -1
+            data = self.fh.read(self.read_chunk_size)
+            while len(self._chunks) >= self.read_chunk_limit:
+                self._chunks.popitem(last=False)
+        self._chunks[chunk] = data
         return data
 
     def __bytes__(self):
         return self[0:len(self)]
 
-    def find(self, s, start=0):
+    def close(self):
+        """
+        Release the mapping and close the file handle.
+        """
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._chunks.clear()
+        self.fh.close()
+
+    def find(self, s, start=0, end=None):
         """
         From a specific point in the file, find a byte string.
 
         @param s:       Byte string to look for
         @param start:   Offset in the file to search from
+        @param end:     Offset in the file that the string must end before, or None for the end
 
         @return:    -1 if not found, or index from the base offset if found
         """
 
+        if self._mm is not None:
+            if end is None:
+                index = self._mm.find(s, start + self.base_offset)
+            else:
+                index = self._mm.find(s, start + self.base_offset, end + self.base_offset)
+            if index == -1:
+                return -1
+            return index - self.base_offset
+
         search_size = max(len(s) + self.search_chunk_size, self.search_chunk_size * 2)
-        skip_size = search_size - len(s)
+        overlap = max(len(s) - 1, 0)
 
         # We search in chunks within the file, trying to find the string in each chunk.
         # If we don't find the string, we move through the file keeping the window so
         # that we can get the entries without holding the whole file in memory at once.
         self.fh.seek(start + self.base_offset, io.SEEK_SET)
+        self.offset = -1
         datastart = start
-        data = b''
+        data = bytearray()
         while True:
             newdata = self.fh.read(search_size)
             if not newdata:
                 # There was no more data, and we're at the end of the file, so we didn't find it.
                 return -1
-            data += newdata
+            data.extend(newdata)
             index = data.find(s)
             if index != -1:
-                # We found it! So we can return the offset
-                return datastart + index
-            # Not found, so we need to accumulate more
-            data = data[skip_size:]
+                # We found it! So we can return the offset, as long as it is within the range
+                index += datastart
+                if end is not None and index + len(s) > end:
+                    return -1
+                return index
+            if end is not None and datastart + len(data) >= end:
+                # We've searched everything up to the end offset
+                return -1
+            # Not found, so we need to accumulate more, keeping only enough of the
+            # window to match a string which spans the next chunk. The window is
+            # updated in place, rather than creating a new copy.
+            skip_size = len(data) - overlap
+            del data[:skip_size]
             datastart += skip_size
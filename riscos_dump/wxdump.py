@@ -7,6 +7,8 @@ WxPython classes for dumping hexadecimal information using the Dump object.
 * `DumpFileFrame` - is a subclass of DumpFrame which displays data from a file.
 """
 
+import collections
+import functools
 import sys
 
 import wx
@@ -15,6 +17,74 @@ import wx.grid as gridlib
 import riscos_dump.dump as dump
 
 
+# Hexadecimal strings for each byte value, so that cells need not be formatted each time
+hex_byte = tuple('{:02X}'.format(b) for b in range(256))
+
+if sys.version_info.major == 3:
+    # Types which are plain strings within the coloured cell content
+    str_types = (str,)
+
+    def data_bytes(data):
+        """
+        Convert a data source to bytes.
+
+        @param data:    Data source object
+
+        @return:    bytes for the data
+        """
+        return bytes(data)
+
+else:
+    str_types = (str, unicode)
+
+    def data_bytes(data):
+        """
+        Convert a data source to bytes.
+
+        @param data:    Data source object
+
+        @return:    bytes for the data
+        """
+        # Python 2 doesn't have the calls to __bytes__ for bytes operations,
+        # so we must do this ourselves.
+        if isinstance(data, bytes):
+            return data
+        if getattr(data, '__bytes__', None):
+            return data.__bytes__()
+        return data[0:len(data)]
+
+
+# Colour names for the values which are wider than a byte
+width_colour = {
+        2: 'halfword',
+        4: 'word',
+    }
+
+# Cell alignments for the value columns and the text columns
+align_right = (wx.ALIGN_RIGHT, wx.ALIGN_CENTER)
+align_left = (wx.ALIGN_LEFT, wx.ALIGN_CENTER)
+
+
+def byte_colour_name(b):
+    """
+    Classify a byte value into one of the colours used for the byte cells.
+
+    @param b:   Byte value
+
+    @return:    colour name
+    """
+    if b < 32 or b == 127:
+        return 'control'
+    elif (64 < b < 91) or (96 < b < 122):
+        return 'alpha'
+    elif (48 < b < 58):
+        return 'number'
+    elif b < 128:
+        return 'plain'
+    else:
+        return 'topbit'
+
+
 class WxDumpConfig(object):
     colours = {
             # Grid lines and the cursor
@@ -62,6 +132,15 @@ class WxDumpConfig(object):
     # How many rows we will cache at a time
     row_cache_limit = 400
 
+    # How many rows after a row that isn't cached are prepared along with it
+    row_prefetch = 8
+
+    # Number of rows moved by each scroll step (eg each notch of the mouse wheel)
+    scroll_rows_per_line = 1
+
+    # How long the pointer must stay over a cell before `mouse_over` is called (ms)
+    mouse_over_delay = 10
+
     # How high the default size of the frame should be
     frame_max_height = 600
 
@@ -84,20 +163,28 @@ class WxDumpConfig(object):
     has_save_data = True
     default_savedata_filename = 'Dump.bin'
 
-    byte_colour = [0] * 256
-    for b in range(256):
-        if b < 32 or b == 127:
-            colour_name = 'control'
-        elif (64 < b < 91) or (96 < b < 122):
-            colour_name = 'alpha'
-        elif (48 < b < 58):
-            colour_name = 'number'
-        elif b < 128:
-            colour_name = 'plain'
-        else:
-            colour_name = 'topbit'
+    # Colour names for each byte value
+    byte_colour = [byte_colour_name(b) for b in range(256)]
 
-        byte_colour[b] = colour_name
+    # The grid cell attributes for each of the colours, created when first used
+    attributes = None
+
+    def get_attributes(self):
+        """
+        Get the grid cell attributes for the colours.
+
+        The attributes are created once and shared by all the tables using this configuration.
+
+        @return:    Dictionary of GridCellAttr objects, keyed by colour name
+        """
+        if self.attributes is None:
+            self.attributes = {}
+            for (name, cols) in self.colours.items():
+                attr = gridlib.GridCellAttr()
+                attr.SetBackgroundColour(cols[0])
+                attr.SetTextColour(cols[1])
+                self.attributes[name] = attr
+        return self.attributes
 
     def cell_info(self, offset):
         """
@@ -146,6 +233,47 @@ class WxDumpConfigDark(WxDumpConfig):
         }
 
 
+class RowCache(collections.OrderedDict):
+    """
+    Cache of values for rows, which discards the least recently used rows when full.
+    """
+
+    # Python 2 cannot move entries within the dictionary, so they must be reinserted
+    can_reorder = hasattr(collections.OrderedDict, 'move_to_end')
+
+    def __init__(self, limit):
+        super(RowCache, self).__init__()
+        self.limit = limit
+
+    def fetch(self, row):
+        """
+        Read the value cached for a row, marking it as the most recently used.
+
+        @param row:     Row to read
+
+        @return:        cached value, or None if the row is not cached
+        """
+        value = self.get(row, None)
+        if value is not None:
+            if self.can_reorder:
+                self.move_to_end(row)
+            else:
+                del self[row]
+                self[row] = value
+        return value
+
+    def store(self, row, value):
+        """
+        Store a value for a row, discarding the least recently used rows if we are full.
+
+        @param row:     Row to store
+        @param value:   Value to cache for the row
+        """
+        while self and len(self) >= self.limit:
+            self.popitem(last=False)
+        self[row] = value
+
+
 class DumpTable(gridlib.GridTableBase):
 
     def __init__(self, dump, data, config):
@@ -156,57 +284,85 @@ class DumpTable(gridlib.GridTableBase):
         super(DumpTable, self).__init__()
 
         # Attributes applying to bytes
-        self.attributes = {}
-        colours = self.config.colours
-        for (name, cols) in colours.items():
-            attr = gridlib.GridCellAttr()
-            attr.SetBackgroundColour(cols[0])
-            attr.SetTextColour(cols[1])
-            self.attributes[name] = attr
-
-        self.align_right = (wx.ALIGN_RIGHT, wx.ALIGN_CENTER)
-        self.align_left = (wx.ALIGN_LEFT, wx.ALIGN_CENTER)
-
-        self.headings = [''] * self.dump.columns
-        self.column_alignment = []
-
-        # We keep a cache of the row data we've read from the Dump object, but discard once
-        # we reache this limit.
+        self.attributes = self.config.get_attributes()
+
+        # Attributes for the text and annotation columns
+        self.column_attributes = (self.attributes['text'], self.attributes['annotation'])
+
+        # Attributes for each byte value, so that byte cells need only a single lookup
+        self.byte_attributes = [self.attributes[colour_name] for colour_name in self.config.byte_colour]
+
+        self.headings = ('',) * self.dump.columns
+        self.column_alignment = ()
+
+        # We keep a cache of the row data we've read from the Dump object, discarding the
+        # least recently used rows once we reach this limit.
         self.row_cache_limit = config.row_cache_limit
-        self.row_cache = {}
+        self.row_cache = RowCache(self.row_cache_limit)
+
+        # The row labels and annotations are cached in the same way
+        self.row_label_cache = RowCache(self.row_cache_limit)
+        self.row_annotation_cache = RowCache(self.row_cache_limit)
+
+        # The most recently used row is kept separately, as wx asks about each cell in turn
+        self.last_row = None
+        self.last_row_entry = None
 
         self.update_content()
 
     def update_content(self):
-        self.headings = self.dump.data_headings()
-        self.column_alignment = [self.align_right] * self.dump.columns
+        # The dimensions are used for every cell, so we keep them locally
+        self.columns = self.dump.columns
+        self.width = self.dump.width
+        self.rowsize = self.columns * self.width
+        self.number_cols = self.columns + 1
+        if self.dump.annotations:
+            self.number_cols += 1
+        self.update_length()
+
+        # Only bytes are coloured by value; other widths use the same attributes for every row
+        if self.width == 1:
+            self.width_attributes = None
+        else:
+            attr = self.attributes[width_colour.get(self.width, 'invalid')]
+            self.width_attributes = [attr] * self.columns + [self.attributes['text'],
+                                                             self.attributes['annotation']]
+
+        self.last_row = None
+        self.row_label_cache.clear()
+        self.row_annotation_cache.clear()
+        headings = list(self.dump.data_headings())
+        column_alignment = [align_right] * self.columns
 
         if self.dump.text:
-            self.headings.append(self.dump.text_label)
-            self.column_alignment.append(self.align_left)
+            headings.append(self.dump.text_label)
+            column_alignment.append(align_left)
 
         if self.dump.annotations:
-            self.headings.append(self.dump.annotation_label)
-            self.column_alignment.append(self.align_left)
+            headings.append(self.dump.annotation_label)
+            column_alignment.append(align_left)
+
+        # These don't change until the content is updated again
+        self.headings = tuple(headings)
+        self.column_alignment = tuple(column_alignment)
+
+    def update_length(self):
+        # The length of some data sources isn't cheap to find, so it is only read when the data changes
+        self.data_length = len(self.data)
+        self.number_rows = (self.data_length + self.rowsize - 1) // self.rowsize
 
     def GetNumberRows(self):
-        rowsize = self.dump.columns * self.dump.width
-        return int((len(self.data) + rowsize - 1) / rowsize)
+        return self.number_rows
 
     def GetNumberCols(self):
-        columns = self.dump.columns + 1
-        if self.dump.annotations:
-            columns += 1
-        return columns
+        return self.number_cols
 
     def IsEmptyCell(self, row, col):
-        if col >= self.dump.columns:
+        if col >= self.columns:
             # The text/annotation column is always valid
             return False
-        (rowvalues, rowtext, rowannotation) = self.setup_row(row)
-        if not rowvalues:
-            return True
-        return rowvalues[col] is None
+        # Cells are only empty if they lie beyond the end of the data
+        return row * self.rowsize + col * self.width >= self.data_length
 
     def GetColLabelValue(self, col):
         if col < len(self.headings):
@@ -215,92 +371,208 @@ class DumpTable(gridlib.GridTableBase):
             return ''
 
     def GetRowLabelValue(self, row):
-        return self.dump.format_address(self.dump.row_to_offset(row)).upper()
+        label = self.row_label_cache.fetch(row)
+        if label is None:
+            label = self.dump.format_address(self.dump.row_to_offset(row)).upper()
+            self.row_label_cache.store(row, label)
+        return label
 
     def GetCellAlignment(self, row, col):
         return self.column_alignment[col]
 
     def GetAttr(self, row, col, kind):
-        (rowvalues, rowtext, rowannotation) = self.setup_row(row)
-        if not rowvalues:
-            attr = self.attributes['invalid']
+        if col >= self.columns:
+            # The text and annotation columns don't depend on the row
+            attr = self.column_attributes[col - self.columns]
+        elif self.width_attributes:
+            # Values wider than a byte aren't coloured by their content
+            attr = self.width_attributes[col]
         else:
-            if col == self.dump.columns:
-                attr = self.attributes['text']
-            elif col == self.dump.columns + 1:
-                attr = self.attributes['annotation']
-            else:
-                if self.dump.width == 1:
-                    value = rowvalues[col]
-                    if value is None:
-                        colour_name = 'invalid'
-                    else:
-                        colour_name = self.config.byte_colour[value]
-                    attr = self.attributes[colour_name]
-                elif self.dump.width == 4:
-                    attr = self.attributes['word']
-                elif self.dump.width == 2:
-                    attr = self.attributes['halfword']
-                else:
-                    attr = self.attributes['invalid']
+            attr = self.setup_row(row)[1][col]
         attr.IncRef()
         return attr
 
     def GetValue(self, row, col):
-        (rowvalues, rowtext, rowannotation) = self.setup_row(row)
+        if col > self.columns:
+            return self.row_annotation(row)
+        return self.setup_row(row)[0][col]
+
+    def row_annotation(self, row):
+        """
+        Read the annotation for a row.
+
+        The annotations are only generated when their cells are drawn, as they may be
+        expensive to produce and the column may not be visible.
+
+        @param row:     Row number
+
+        @return:    annotation column content
+        """
+        rowannotation = self.row_annotation_cache.fetch(row)
+        if rowannotation is None:
+            if row * self.rowsize >= self.data_length:
+                rowannotation = ''
+            else:
+                rowannotation = self.dump.format_annotation(row)
+            self.row_annotation_cache.store(row, rowannotation)
+        return rowannotation
+
+    def row_cells(self, rowvalues, rowtext, rowdata=None):
+        """
+        Format the values in a row as they will be displayed in the cells.
+
+        @param rowvalues:       List of the values in the row (None for cells beyond the data)
+        @param rowtext:         Text column content
+        @param rowdata:         Data for the row, or None if not known
+
+        @return:    list of the cell content for each column, including the text
+                    column (None for cells beyond the data)
+        """
+        width = self.width
+        if width in (2, 4) and dump.hex_separator and \
+                isinstance(rowdata, (bytes, bytearray, memoryview)) and \
+                len(rowdata) == width * self.columns:
+            # Whole rows of words can be converted to hex directly from the data
+            if self.dump.little_endian:
+                rowcells = rowdata[::-1].hex(' ', width).upper().split(' ')
+                rowcells.reverse()
+            else:
+                rowcells = rowdata.hex(' ', width).upper().split(' ')
+        elif width == 1:
+            rowcells = [None if value is None else hex_byte[value] for value in rowvalues]
+        elif width == 4:
+            rowcells = [None if value is None else '%08X' % (value,) for value in rowvalues]
+        elif width == 2:
+            rowcells = [None if value is None else hex_byte[value >> 8] + hex_byte[value & 255]
+                        for value in rowvalues]
+        else:
+            rowcells = list(rowvalues)
+        rowcells.append(rowtext)
+        return rowcells
+
+    def row_attributes(self, rowvalues):
+        """
+        Work out the attributes for the cells in a row.
+
+        @param rowvalues:   List of the values in the row (None for cells beyond the data)
+
+        @return:    list of GridCellAttr objects for each column, including the text
+                    and annotation columns
+        """
+        if self.width_attributes:
+            # Every row has the same attributes, so they share the list
+            return self.width_attributes
+
         if not rowvalues:
-            return '<invalid>'
-
-        if col < self.dump.columns:
-            width = self.dump.width
-            value = rowvalues[col]
-            if value is None:
-                return None
-            if width == 1:
-                return '{:02X}'.format(value)
-            elif width == 4:
-                return '{:08X}'.format(value)
-            elif width == 2:
-                return '{:04X}'.format(value)
-            return value
-        elif col == self.dump.columns:
-            return rowtext
+            rowattrs = [self.attributes['invalid']] * self.columns
         else:
-            return rowannotation
+            invalid = self.attributes['invalid']
+            byte_attributes = self.byte_attributes
+            rowattrs = [invalid if value is None else byte_attributes[value] for value in rowvalues]
+        rowattrs.append(self.attributes['text'])
+        rowattrs.append(self.attributes['annotation'])
+        return rowattrs
+
+    def row_entry(self, row, rowdata):
+        """
+        Build the cache entry for a row.
+
+        @param row:         Row number
+        @param rowdata:     Data for the row
+
+        @return:    tuple of (rowcells, rowattrs)
+        """
+        if not rowdata:
+            # No data, so these cells are empty
+            rowvalues = [None] * self.columns
+            rowtext = ''
+        else:
+
+            rowvalues = self.dump.data_values(rowdata)
+            if len(rowvalues) < self.columns:
+                if not isinstance(rowvalues, list):
+                    rowvalues = list(rowvalues)
+                rowvalues += [None] * (self.columns - len(rowvalues))
+
+            rowtext = self.dump.format_chars(rowdata)
+
+        # Only the cell content and attributes are kept; the values are not needed
+        # once they have been formatted.
+        rowcells = self.row_cells(rowvalues, rowtext, rowdata)
+        rowattrs = self.row_attributes(rowvalues)
+
+        return (rowcells, rowattrs)
 
     def setup_row(self, row):
-        if row not in self.row_cache:
+        if row == self.last_row:
+            return self.last_row_entry
+
+        entry = self.row_cache.fetch(row)
+        if entry is None:
+            # Rows are usually wanted in order, so prepare the following rows at the same time
+            self.setup_rows(row, min(row + self.config.row_prefetch, self.number_rows - 1))
+            entry = self.row_cache.fetch(row)
+            if entry is None:
+                entry = self.row_entry(row, self.dump.row_data(row))
+                self.row_cache.store(row, entry)
+
+        self.last_row = row
+        self.last_row_entry = entry
+        return entry
+
+    def setup_rows(self, first, last):
+        """
+        Prepare the cache entries for a range of rows, reading their data in one access.
 
-            rowdata = self.dump.row_data(row)
-            if not rowdata:
-                # No data, so these cells are empty
-                rowvalues = [None] * self.dump.columns
-                rowtext = ''
-                rowannotation = ''
-            else:
+        @param first:   First row to prepare
+        @param last:    Last row to prepare (inclusive)
+        """
+        # Don't prepare more rows than we can hold in the cache
+        last = min(last, first + self.row_cache_limit - 1)
+        rows = [row for row in range(first, last + 1) if row not in self.row_cache]
+        if not rows:
+            return
 
-                rowvalues = self.dump.row_values(row)
-                if len(rowvalues) < self.dump.columns:
-                    if not isinstance(rowvalues, list):
-                        rowvalues = list(rowvalues)
-                    rowvalues += [None] * (self.dump.columns - len(rowvalues))
+        rowsize = self.rowsize
+        start = rows[0] * rowsize
+        data = self.dump.data[start:(rows[-1] + 1) * rowsize]
+        try:
+            data = memoryview(data)
+        except TypeError:
+            # A sequence of values rather than a buffer
+            data = memoryview(bytearray(data))
 
-                rowbytevalues = [c for c in rowdata]
-                rowtext = self.dump.format_chars(rowbytevalues)
-                rowannotation = self.dump.format_annotation(row)
+        for row in rows:
+            offset = row * rowsize - start
+            self.row_cache.store(row, self.row_entry(row, data[offset:offset + rowsize]))
 
-            if len(self.row_cache) > self.row_cache_limit:
-                # Reset the cache so that we don't accumulate forever
-                #print("Clear row cache")
-                self.row_cache = {}
+    def reserve_rows(self, rows):
+        """
+        Ensure that the caches can hold at least a given number of rows.
 
-            self.row_cache[row] = (rowvalues, rowtext, rowannotation)
+        @param rows:    Number of rows the caches should be able to hold
+        """
+        if rows > self.row_cache_limit:
+            self.row_cache_limit = rows
+            self.row_cache.limit = rows
+            self.row_label_cache.limit = rows
+            self.row_annotation_cache.limit = rows
 
-        return self.row_cache[row]
+    def update_format(self):
+        """
+        Update the table after the width or number of columns in the dump has changed.
+        """
+        self.row_cache.clear()
+        self.update_content()
 
     def SetData(self, data):
+        self.data = data
         self.dump.data = data
-        self.row_cache = {}
+        self.update_length()
+        self.last_row = None
+        self.row_cache.clear()
+        self.row_label_cache.clear()
+        self.row_annotation_cache.clear()
 
 
 class DumpStatusBar(wx.StatusBar):
@@ -319,9 +591,13 @@ class DumpCellRenderer(wx.grid.GridCellStringRenderer):
     text or attribution cells with colouring.
     """
 
+    # Colours are shared between all the renderers
+    cached_colours = {}
+
     def __init__(self, *args, **kwargs):
         super(DumpCellRenderer, self).__init__(*args, **kwargs)
-        self.cached_colours = {}
+        # The cells use a fixed width font, so we only need to measure one character
+        self.glyph_width = None
 
     def Draw(self, grid, attr, dc, rect, row, col, isSelected):
         text = grid.table.GetValue(row, col)
@@ -329,36 +605,43 @@ class DumpCellRenderer(wx.grid.GridCellStringRenderer):
             super(DumpCellRenderer, self).Draw(grid, attr, dc, rect, row, col, isSelected)
         else:
             (hAlign, vAlign) = attr.GetAlignment()
+            background = attr.BackgroundColour
+            foreground = attr.TextColour
 
             if isSelected:
                 bg = grid.GetSelectionBackground()
                 fg = grid.GetSelectionForeground()
             else:
-                bg = attr.BackgroundColour
-                fg = attr.TextColour
+                bg = background
+                fg = foreground
 
             dc.SetBrush(wx.Brush(bg, wx.SOLID))
             dc.SetPen(wx.Pen(bg))
             dc.DrawRectangle(rect)
 
-            dc.SetTextBackground(attr.BackgroundColour)
+            dc.SetTextBackground(background)
             dc.SetFont(attr.GetFont())
+            if self.glyph_width is None:
+                self.glyph_width = dc.GetTextExtent('M')[0]
 
+            glyph_width = self.glyph_width
+            cached_colours = self.cached_colours
+            draw_text = grid.DrawTextRectangle
             for part in text:
-                if isinstance(part, (str, unicode)):
-                    dc.SetTextForeground(attr.TextColour)
+                if isinstance(part, str_types):
+                    dc.SetTextForeground(foreground)
                     textpart = part
                 else:
                     colname = part[0]
                     textpart = part[1]
-                    col = self.cached_colours.get(colname, None)
+                    col = cached_colours.get(colname, None)
                     if not col:
                         col = wx.Colour(colname)
-                        self.cached_colours[colname] = col
+                        cached_colours[colname] = col
                     dc.SetTextForeground(col)
 
-                grid.DrawTextRectangle(dc, textpart, rect, hAlign, vAlign)
-                (w, h) = dc.GetTextExtent(textpart)
+                draw_text(dc, textpart, rect, hAlign, vAlign)
+                w = glyph_width * len(textpart)
                 rect.x += w
                 rect.width -= w
 
@@ -381,6 +664,10 @@ class DumpGrid(gridlib.Grid):
 
         self.text_column = self.dump.columns
         self.annotation_column = self.dump.columns + 1
+        self.rowsize = self.dump.columns * self.dump.width
+
+        # Nothing needs to be drawn until the grid has been set up
+        self.BeginBatch()
 
         self.table = DumpTable(self.dump, self.dump.data, self.config)
         self.SetTable(self.table, True)
@@ -408,14 +695,34 @@ class DumpGrid(gridlib.Grid):
         self.annotationsize = (24 * 16, 16)
         self.min_width = 16
         self.min_height = 16
+        self.char_size = None
+        self.digit_size = None
+        self.resize_key = None
+        self.resize_pending = False
+
+        # The row cache should hold a few screens of rows, so that scrolling back and
+        # forth doesn't need the rows to be rebuilt.
+        self.visible_cache_multiple = 4
         self.resize()
 
+        self.EndBatch()
+
         self.last_mouse_over = None
+        self.last_mouse_rect = None
+        self.mouse_over_timer = None
         self.grid_window = self.GetGridWindow()
+        # Draw the cells into a buffer, so that scrolling and repainting don't flicker
+        self.grid_window.SetDoubleBuffered(True)
         self.grid_window.Bind(wx.EVT_MOTION, self.on_mouse_over)
         self.grid_window.Bind(wx.EVT_LEAVE_WINDOW, self.on_mouse_out)
+        self.Bind(wx.EVT_WINDOW_DESTROY, self.on_destroy)
         self.Bind(wx.grid.EVT_GRID_SELECT_CELL, self.on_select_cell)
 
+        # Prepare the rows that come into view when scrolled or resized
+        self.setup_visible_pending = False
+        self.Bind(wx.EVT_SCROLLWIN, self.on_view_change)
+        self.Bind(wx.EVT_SIZE, self.on_view_change)
+
         # Build up the menu we'll use
         self.menu = wx.Menu()
 
@@ -446,8 +753,8 @@ class DumpGrid(gridlib.Grid):
         cursor = self.GetAddress() - self.dump.address_base
         index = self.dump.data.find(s, cursor + 1)
         if index == -1:
-            # not found after the current cursor, so look from the start
-            index = self.dump.data.find(s)
+            # not found after the current cursor, so look from the start up to the cursor
+            index = self.dump.data.find(s, 0, cursor + len(s))
             if index == -1:
                 # Not found at the start either
                 return False
@@ -458,6 +765,7 @@ class DumpGrid(gridlib.Grid):
             return False
 
         self.GoToCell(row, col)
+        self.setup_visible_rows()
         return True
 
     def GotoAddress(self, address):
@@ -473,6 +781,7 @@ class DumpGrid(gridlib.Grid):
             return False
 
         self.GoToCell(row, col)
+        self.setup_visible_rows()
         return True
 
     def GetAddress(self):
@@ -492,19 +801,19 @@ class DumpGrid(gridlib.Grid):
         """
         if self.config.has_width_1:
             self.item_bytes = menu.Append(-1, "Bytes", kind=wx.ITEM_CHECK)
-            self.Bind(wx.EVT_MENU, lambda event: self.SetDumpWidth(1), self.item_bytes)
+            self.Bind(wx.EVT_MENU, functools.partial(self.on_menu_width, 1), self.item_bytes)
         else:
             self.item_bytes = None
 
         if self.config.has_width_2:
             self.item_halfwords = menu.Append(-1, "Half words", kind=wx.ITEM_CHECK)
-            self.Bind(wx.EVT_MENU, lambda event: self.SetDumpWidth(2), self.item_halfwords)
+            self.Bind(wx.EVT_MENU, functools.partial(self.on_menu_width, 2), self.item_halfwords)
         else:
             self.item_halfwords = None
 
         if self.config.has_width_4:
             self.item_words = menu.Append(-1, "Words", kind=wx.ITEM_CHECK)
-            self.Bind(wx.EVT_MENU, lambda event: self.SetDumpWidth(4), self.item_words)
+            self.Bind(wx.EVT_MENU, functools.partial(self.on_menu_width, 4), self.item_words)
         else:
             self.item_words = None
 
@@ -520,7 +829,7 @@ class DumpGrid(gridlib.Grid):
                     checked = False
                 menuitem = self.menu.Append(-1, name, kind=wx.ITEM_NORMAL if not checked else wx.ITEM_CHECK)
                 self.menu_items.append((menuitem, name, func, checked))
-                self.Bind(wx.EVT_MENU, lambda event, func=func: func(self, self.dump, chosen=True), menuitem)
+                self.Bind(wx.EVT_MENU, functools.partial(self.on_menu_function, func), menuitem)
 
     def add_menu_extra(self, menu):
         if self.config.has_goto_address or self.config.has_find_string or self.config.menu_extra:
@@ -551,7 +860,13 @@ class DumpGrid(gridlib.Grid):
                     checked = False
                 menuitem = self.menu.Append(-1, name, kind=wx.ITEM_NORMAL if not checked else wx.ITEM_CHECK)
                 self.menu_items.append((menuitem, name, func, checked))
-                self.Bind(wx.EVT_MENU, lambda event, func=func: func(self, self.dump, chosen=True), menuitem)
+                self.Bind(wx.EVT_MENU, functools.partial(self.on_menu_function, func), menuitem)
+
+    def on_menu_width(self, width, event):
+        self.SetDumpWidth(width)
+
+    def on_menu_function(self, func, event):
+        func(self, self.dump, chosen=True)
 
     def on_key(self, event):
         if self.config.has_find_string:
@@ -589,24 +904,61 @@ class DumpGrid(gridlib.Grid):
 
         self.PopupMenu(self.menu)
 
+    def on_view_change(self, event):
+        event.Skip()
+        # The view hasn't changed yet, so prepare the rows once the event has been processed
+        if not self.setup_visible_pending:
+            self.setup_visible_pending = True
+            wx.CallAfter(self.on_view_changed)
+
+    def on_view_changed(self):
+        self.setup_visible_pending = False
+        if not self:
+            # The grid was destroyed before we got here
+            return
+        self.setup_visible_rows()
+
     def on_mouse_over(self, event):
         pos = self.CalcUnscrolledPosition(event.GetX(), event.GetY())
+        if self.last_mouse_rect is not None and self.last_mouse_rect.Contains(pos):
+            # Still within the same cell, so there's nothing to do
+            return
         cell_pos = self.XYToCell(pos)
+        if cell_pos.Row >= 0 and cell_pos.Col >= 0:
+            self.last_mouse_rect = self.CellToRect(cell_pos.Row, cell_pos.Col)
+        else:
+            self.last_mouse_rect = None
         if self.last_mouse_over != cell_pos:
             self.last_mouse_over = cell_pos
-            if cell_pos.Col >= self.dump.columns:
+            if cell_pos.Col >= self.text_column:
                 # They're over the text column
                 offset = None
             else:
-                offset = self.dump.row_to_offset(cell_pos.Row) + cell_pos.Col * self.dump.width
-                if offset >= len(self.dump.data):
+                offset = cell_pos.Row * self.rowsize + cell_pos.Col * self.dump.width
+                if offset >= self.table.data_length:
                     offset = None
-            self.config.mouse_over(offset)
+            # Only report the cell once the pointer has settled on it
+            if self.mouse_over_timer is not None and self.mouse_over_timer.IsRunning():
+                self.mouse_over_timer.Start(self.config.mouse_over_delay, offset)
+            else:
+                self.mouse_over_timer = wx.CallLater(self.config.mouse_over_delay,
+                                                     self.config.mouse_over, offset)
 
     def on_mouse_out(self, event):
         self.last_mouse_over = None
+        self.last_mouse_rect = None
+        if self.mouse_over_timer is not None:
+            self.mouse_over_timer.Stop()
         self.config.mouse_over(None)
 
+    def on_destroy(self, event):
+        event.Skip()
+        if event.GetEventObject() is self:
+            # Don't resize or report the pointer position once we've gone
+            self.resize_pending = False
+            if self.mouse_over_timer is not None:
+                self.mouse_over_timer.Stop()
+
     def on_goto_address(self, event):
         start = self.dump.address_base
         end = self.dump.address_base + len(self.dump.data)
@@ -665,21 +1017,16 @@ class DumpGrid(gridlib.Grid):
 
             # save the current contents in the file
             filename = dialogue.GetPath()
-            if isinstance(filename, unicode):
+            if not isinstance(filename, str):
+                # Python 2 unicode filenames are given as UTF-8
                 filename = filename.encode('utf-8')
 
             with open(filename, 'wb') as fh:
-                if sys.version_info.major == 3:
-                    data = bytes(self.dump.data)
-                else:
-                    # Python 2 doesn't have the calls to __bytes__ for bytes operations,
-                    # so we must do this ourselves.
-                    data = self.dump.data
-                    if not isinstance(data, bytes):
-                        if getattr(self.dump.data, '__bytes__', None):
-                            data = self.dump.data.__bytes__()
-                        else:
-                            data = data[0:len(data)]
+                try:
+                    # Write buffers directly, without copying them
+                    data = memoryview(self.dump.data)
+                except TypeError:
+                    data = data_bytes(self.dump.data)
                 fh.write(data)
 
     def GetVisibleRange(self):
@@ -697,57 +1044,142 @@ class DumpGrid(gridlib.Grid):
 
         return (x0, y0, x1, y1)
 
+    def setup_visible_rows(self):
+        """
+        Prepare the rows which are visible, so that they are read in one go, rather than
+        as each cell is drawn.
+        """
+        (x0, y0, x1, y1) = self.GetVisibleRange()
+        self.table.reserve_rows(self.visible_cache_multiple * (y1 - y0 + 1))
+        self.table.setup_rows(y0, y1)
+
     def ScrollToRow(self, row):
         ux, uy = self.GetScrollPixelsPerUnit()
         (x0, y0, x1, y1) = self.CellToRect(row, 0)
         self.Scroll(x0 / ux, y0 / uy)
 
     def SetDumpWidth(self, width):
-        self.dump.columns = int(self.dump.width * self.dump.columns / width)
+        if width == self.dump.width:
+            return
+        self.dump.columns = self.dump.width * self.dump.columns // width
         self.dump.width = width
+        self.rowsize = self.dump.columns * self.dump.width
+        self.text_column = self.dump.columns
+        self.annotation_column = self.dump.columns + 1
 
-        self.table = DumpTable(self.dump, self.dump.data, config=self.config)
-        self.SetTable(self.table, True)
-        self.resize()
-        self.parent.resize()
+        self.update_table()
+        self.request_resize()
 
     def SetDumpColumns(self, columns):
         self.dump.columns = columns
+        self.rowsize = self.dump.columns * self.dump.width
+        self.text_column = self.dump.columns
+        self.annotation_column = self.dump.columns + 1
 
-        self.table = DumpTable(self.dump, self.dump.data, config=self.config)
-        self.SetTable(self.table, True)
-        self.resize()
-        self.parent.resize()
+        self.update_table()
+        self.request_resize()
+
+    def update_table(self):
+        """
+        Update the table after the format of the dump has changed.
+
+        The grid is told about the rows and columns which have been added or removed,
+        rather than replacing the table.
+        """
+        old_rows = self.table.GetNumberRows()
+        old_cols = self.table.GetNumberCols()
+        self.table.update_format()
+        new_rows = self.table.GetNumberRows()
+        new_cols = self.table.GetNumberCols()
+
+        self.BeginBatch()
+        if new_rows < old_rows:
+            self.ProcessTableMessage(gridlib.GridTableMessage(self.table,
+                                                              gridlib.GRIDTABLE_NOTIFY_ROWS_DELETED,
+                                                              new_rows, old_rows - new_rows))
+        elif new_rows > old_rows:
+            self.ProcessTableMessage(gridlib.GridTableMessage(self.table,
+                                                              gridlib.GRIDTABLE_NOTIFY_ROWS_APPENDED,
+                                                              new_rows - old_rows))
+        if new_cols < old_cols:
+            self.ProcessTableMessage(gridlib.GridTableMessage(self.table,
+                                                              gridlib.GRIDTABLE_NOTIFY_COLS_DELETED,
+                                                              new_cols, old_cols - new_cols))
+        elif new_cols > old_cols:
+            self.ProcessTableMessage(gridlib.GridTableMessage(self.table,
+                                                              gridlib.GRIDTABLE_NOTIFY_COLS_APPENDED,
+                                                              new_cols - old_cols))
+        self.EndBatch()
+        self.ForceRefresh()
 
     def SetData(self, data):
         self.table.SetData(data)
         self.ForceRefresh()
 
-    def resize(self):
+    def request_resize(self):
+        """
+        Resize the grid and its parent once the current events have been processed.
+
+        Multiple requests before then are combined into a single resize.
+        """
+        if not self.resize_pending:
+            self.resize_pending = True
+            wx.CallAfter(self.on_resize_request)
+
+    def on_resize_request(self):
+        if not self.resize_pending or not self:
+            # The request was cancelled, or the grid has been destroyed
+            return
+        self.resize_pending = False
+        if self.resize():
+            self.parent.resize()
+
+    def resize(self, force=False):
+        """
+        Update the sizes of the grid's cells for the current format.
+
+        @param force:   True to update the sizes even if the format has not changed
+
+        @return:    True if the sizes were updated, False if nothing had changed
+        """
+        key = (self.dump.width, self.dump.columns, self.dump.annotations,
+               self.config.row_annotation_size, self.table.GetNumberRows())
+        if key == self.resize_key and not force:
+            return False
+        self.resize_key = key
+
         self.text_column = self.dump.columns
         self.annotation_column = self.dump.columns + 1
+        # The cells may have moved
+        self.last_mouse_rect = None
 
         self.BeginBatch()
 
-        dc = wx.ScreenDC()
-        dc.SetFont(self.cellfont)
-        self.labelsize = dc.GetTextExtent('M' * 9)
-        self.cellsize = dc.GetTextExtent('0' * (self.dump.width * 2 + 1))
-        self.textsize = dc.GetTextExtent('M' * (self.dump.width * self.dump.columns + 1))
-        self.annotationsize = dc.GetTextExtent('M' * (self.config.row_annotation_size + 1))
+        if self.char_size is None:
+            # The cell font is fixed width, so we only need to measure single characters
+            dc = wx.ScreenDC()
+            dc.SetFont(self.cellfont)
+            self.char_size = dc.GetTextExtent('M')
+            self.digit_size = dc.GetTextExtent('0')
+        (char_width, char_height) = self.char_size
+        (digit_width, digit_height) = self.digit_size
+
+        self.labelsize = (char_width * 9, char_height)
+        self.cellsize = (digit_width * (self.dump.width * 2 + 1), digit_height)
+        self.textsize = (char_width * (self.dump.width * self.dump.columns + 1), char_height)
+        self.annotationsize = (char_width * (self.config.row_annotation_size + 1), char_height)
         # FIXME: This is wrong, but it's about the right sort of size
-        self.scrollbarsize = dc.GetTextExtent('M' * 2)[0]
+        self.scrollbarsize = char_width * 2
 
-        # Set the column widths
-        colsizes = []
-        for col in range(self.dump.columns):
-            colsizes.append(self.cellsize[0])
-        colsizes.append(self.textsize[0])
+        # Set the column widths; the value columns all take the default size, so only
+        # the text and annotation columns need to be set individually.
+        colsizes = [self.textsize[0]]
         if self.dump.annotations:
             colsizes.append(self.annotationsize[0])
         colsizes[-1] += self.scrollbarsize
 
-        for col, size in enumerate(colsizes):
+        self.SetDefaultColSize(self.cellsize[0], True)
+        for col, size in enumerate(colsizes, self.dump.columns):
             self.SetColSize(col, size)
 
         # The column lable height
@@ -759,6 +1191,9 @@ class DumpGrid(gridlib.Grid):
         self.min_width = self.labelsize[0]
 
         self.EndBatch()
+
+        # Scroll by whole rows, so that the grid never has to draw partial rows at the top
+        self.SetScrollLineY(max(self.GetDefaultRowSize(), 1) * self.config.scroll_rows_per_line)
         self.AdjustScrollbars()
 
         self.ForceRefresh()
@@ -768,6 +1203,7 @@ class DumpGrid(gridlib.Grid):
         (width, height) = self.GetBestSize()
         dx = wx.SystemSettings.GetMetric(wx.SYS_VSCROLL_X)
         self.SetMaxSize((width + dx, height))
+        return True
 
     def GetMinSize(self):
         return wx.Size(self.min_width, self.min_height)
@@ -812,6 +1248,13 @@ class DumpFrame(wx.Frame):
 
         self.resize()
 
+        self.Bind(wx.EVT_WINDOW_DESTROY, self.on_destroy)
+
+    def on_destroy(self, event):
+        event.Skip()
+        if event.GetEventObject() is self:
+            self.CloseDumpData()
+
     def resize(self):
         (best_width, best_height) = self.grid.GetBestSize()
         limit_height = min(best_height, self.config.frame_max_height)
@@ -837,6 +1280,12 @@ class DumpFrame(wx.Frame):
         # FIXME: Might be wrong if we refreshed? Read from the grid?
         return self.data
 
+    def CloseDumpData(self):
+        """
+        Release any resources held by the data, once the frame has been destroyed.
+        """
+        pass
+
 
 class DumpFileFrame(DumpFrame):
     """
@@ -845,9 +1294,17 @@ class DumpFileFrame(DumpFrame):
 
     def __init__(self, filename, *args, **kwargs):
         self.filename = filename
+        self.filedata = None
         super(DumpFileFrame, self).__init__(*args, **kwargs)
 
     def GetDumpData(self):
-        fh = open(self.filename, 'rb')
-        data = dump.FileDataSource(fh)
-        return data
+        if self.filedata is None:
+            # The file is memory mapped by the data source where possible
+            fh = open(self.filename, 'rb')
+            self.filedata = dump.FileDataSource(fh)
+        return self.filedata
+
+    def CloseDumpData(self):
+        if self.filedata is not None:
+            self.filedata.close()
+            self.filedata = None
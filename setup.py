@@ -15,9 +15,13 @@ from io import open
 
 here = path.abspath(path.dirname(__file__))
 
-# Get the long description from the README file
-with open(path.join(here, 'README.md'), encoding='utf-8') as f:
-    long_description = f.read()
+
+def read_long_description():
+    """
+    Get the long description from the README file.
+    """
+    with open(path.join(here, 'README.md'), encoding='utf-8') as f:
+        return f.read()
 
 
 setup(
@@ -26,7 +30,7 @@ setup(
     version = '0.2.0',
     license='MIT',
     description = 'Display hexadecimal file dumps like RISC OS',
-    long_description = long_description,
+    long_description = read_long_description(),
     long_description_content_type = 'text/markdown',
     author = 'Charles Ferguson',
     author_email = 'gerph@gerph.org',
@@ -6,7 +6,7 @@ Command line tool for dumping files.
 import argparse
 import sys
 
-import riscos_dump.dump
+import riscos_dump.dump as dump
 
 
 def main():
@@ -26,9 +26,10 @@ def main():
     dumper = dump.Dump()
     if options.words:
         dumper.width = 4
-        dumper.columns = int(row_size / dumper.width)
+        dumper.columns = row_size // dumper.width
 
-    with open(filename, 'rb') as fh:
+    # A large buffer reduces the number of reads when the file can't be memory mapped
+    with open(filename, 'rb', buffering=1 << 20) as fh:
 
         filedata = dump.FileDataSource(fh)
         dumper.show(filedata)
@@ -9,7 +9,6 @@ import os
 import textwrap
 
 import wx
-import wx.adv
 
 import riscos_dump.wxdump as wxdump
 
@@ -20,11 +19,24 @@ app_date = '11 May 2024'
 app_description = "Display contents of files"
 app_copyright = "(C) Gerph, 2022-2024"
 app_website = "https://github.com/gerph/riscos-dump-python"
-try:
-    app_license = open(os.path.join(os.path.dirname(__file__),
-                                    'LICENSE'), 'r').read()
-except IOError:
-    app_license = "WXDump is licensed under MIT license. See the website."
+app_license_file = os.path.join(os.path.dirname(__file__), 'LICENSE')
+app_license = None
+
+
+def read_license():
+    """
+    Read the license text, the first time that it is needed.
+
+    @return:    License text
+    """
+    global app_license
+    if app_license is None:
+        try:
+            with open(app_license_file, 'r') as fh:
+                app_license = fh.read()
+        except IOError:
+            app_license = "WXDump is licensed under MIT license. See the website."
+    return app_license
 
 
 class MainFrame(wx.Frame):
@@ -63,6 +75,9 @@ class MainFrame(wx.Frame):
         self.Destroy()
 
     def OnAbout(self, event):
+        # The advanced controls are only needed for the about box
+        import wx.adv
+
         info = wx.adv.AboutDialogInfo()
         info.SetName(app_name)
         info.SetVersion('{} ({})'.format(app_version,
@@ -70,7 +85,7 @@ class MainFrame(wx.Frame):
         info.SetDescription(app_description)
         info.SetCopyright(app_copyright)
         info.SetWebSite(app_website)
-        license = textwrap.wrap(app_license.replace('\n', ' '))
+        license = textwrap.wrap(read_license().replace('\n', ' '))
         info.SetLicense('\n'.join(license))
 
         wx.adv.AboutBox(info)